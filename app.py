@@ -1,15 +1,56 @@
 # app.py
 # VisionVoice Flask backend.
 # POST /describe-image  — receives image, returns description + hazard + audio URL
+#                         (?audio=false skips TTS; audio_url is then null)
 # GET  /               — health check
+#
+# Production: served by gunicorn with gevent workers so concurrent uploads can
+# overlap the HuggingFace round-trip. Set FLASK_ENV=development for the
+# built-in Flask server.
 
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
-from PIL import Image
-import os, io, traceback
+import os, time, logging, threading, functools
 
-from model_loader import load_model, generate_caption, check_for_hazards
-from tts_generator import generate_audio, cleanup_old_audio
+from model_loader import (
+    load_model, decode_image, generate_caption, format_description,
+    PASSTHROUGH_MAX_BYTES,
+)
+from hazards import check_for_hazards
+from tts_generator import (
+    audio_filename, submit_audio, cleanup_old_audio, AUDIO_MIMETYPE,
+)
+
+# LOG_LEVEL=DEBUG shows the per-request caption/hazard/audio messages
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger("visionvoice")
+
+
+class _TracebackSampler(logging.Filter):
+    """
+    Keep the stack trace on only 1 in `every` error records (the message is
+    always logged), so a flood of bad uploads can't burn CPU formatting
+    tracebacks. Set LOG_TRACEBACK_SAMPLE=100 in production to sample 1%.
+    """
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every  = max(1, every)
+        self._count = 0
+
+    def filter(self, record):
+        if record.exc_info:
+            self._count += 1
+            if self._count % self.every:
+                record.exc_info = None
+                record.exc_text = None
+        return True
+
+
+logger.addFilter(_TracebackSampler(int(os.environ.get("LOG_TRACEBACK_SAMPLE", 1))))
 
 app = Flask(__name__)
 
@@ -27,23 +68,114 @@ CORS(
 AUDIO_DIR = os.path.join(os.path.dirname(__file__), "static", "audio")
 os.makedirs(AUDIO_DIR, exist_ok=True)
 
+AUDIO_KEEP_LATEST = 10
+
+# TTS runs off the request path, on tts_generator's worker pool — the route
+# returns the audio URL at once and the file appears when synthesis finishes
+# (serve_audio 503s until then). In-progress files are marked on disk with a
+# "<filename>.pending" file, not in memory: gunicorn runs several workers and
+# the poll for the audio can land on a different one than the upload.
+# A marker older than AUDIO_PENDING_TIMEOUT is left over from a crashed
+# worker and is ignored.
+AUDIO_PENDING_TIMEOUT = 120   # seconds
+
+# Eviction is an mtime sweep over the directory — shared by all workers
+cleanup_old_audio(AUDIO_DIR, keep_latest=AUDIO_KEEP_LATEST)
+
 _model_loaded = False
 _model_error  = None
+_model_lock   = threading.Lock()
 
 
 def ensure_model_loaded():
     global _model_loaded, _model_error
     if _model_loaded:
         return
-    if _model_error:
-        raise RuntimeError(f"Model init failed earlier: {_model_error}")
+    with _model_lock:   # startup thread and first request may race
+        if _model_loaded:
+            return
+        if _model_error:
+            raise RuntimeError(f"Model init failed earlier: {_model_error}")
+        try:
+            load_model()
+            _model_loaded = True
+            logger.info("Model ready.")
+        except Exception as e:
+            _model_error = str(e)
+            raise
+
+
+def _preload_model():
     try:
-        load_model()
-        _model_loaded = True
-        print("Model ready.")
-    except Exception as e:
-        _model_error = str(e)
-        raise
+        ensure_model_loaded()
+    except Exception:
+        pass   # recorded in _model_error; surfaced by / and /describe-image
+
+
+# Initialise at startup, off the import path, so the first user request
+# doesn't pay for it and the health check reports readiness right away
+threading.Thread(target=_preload_model, daemon=True).start()
+
+
+def _pending_marker(filename):
+    return os.path.join(AUDIO_DIR, f"{filename}.pending")
+
+
+def _is_pending(marker):
+    """True if marker exists and is recent enough to belong to a live worker."""
+    try:
+        return time.time() - os.path.getmtime(marker) < AUDIO_PENDING_TIMEOUT
+    except FileNotFoundError:
+        return False
+
+
+def _claim_pending(marker):
+    """Atomically create marker; False if another worker already holds it."""
+    try:
+        os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        if _is_pending(marker):
+            return False
+        os.utime(marker)   # stale marker from a crashed worker — take it over
+        return True
+
+
+def _audio_done(filename, future):
+    try:
+        future.result()
+    except Exception:
+        logger.exception("Audio generation failed for %s", filename)
+    finally:
+        try:
+            os.remove(_pending_marker(filename))
+        except FileNotFoundError:
+            pass
+    cleanup_old_audio(AUDIO_DIR, keep_latest=AUDIO_KEEP_LATEST)
+
+
+def queue_audio(description):
+    """
+    Return (filename, ready) for a description, scheduling synthesis in
+    the background unless the file already exists or is being generated
+    (by this or any other worker).
+    Identical descriptions map to the same file (see audio_filename).
+    """
+    filename = audio_filename(description)
+    path     = os.path.join(AUDIO_DIR, filename)
+
+    if os.path.exists(path):
+        os.utime(path)   # refresh mtime so the LRU sweep keeps hot files
+        logger.debug("Audio cache hit: %s", filename)
+        return filename, True
+
+    # The marker is created before returning, so a poll that reaches any
+    # worker right after this response sees the file as in progress
+    if not _claim_pending(_pending_marker(filename)):
+        return filename, False
+    future = submit_audio(description, AUDIO_DIR, filename)
+    future.add_done_callback(functools.partial(_audio_done, filename))
+    return filename, False
 
 
 @app.route("/", methods=["GET"])
@@ -75,51 +207,82 @@ def describe_image():
         return jsonify({"error": "Empty filename."}), 400
 
     try:
-        # 3. Open image
-        image = Image.open(io.BytesIO(image_file.read())).convert("RGB")
-        print(f"Image: {image.size[0]}x{image.size[1]}px")
+        # 3. Open the upload — only an upload small enough to be passed
+        #    through to HF as-is is read into memory; larger ones are decoded
+        #    straight from the spooled stream (no full-size bytes copy)
+        stream = image_file.stream
+        size   = stream.seek(0, os.SEEK_END)
+        stream.seek(0)
+        logger.debug("Image: %dKB", size // 1024)
+        if size <= PASSTHROUGH_MAX_BYTES:
+            image = stream.read()
+        else:
+            image = decode_image(stream)
 
         # 4. Generate caption via HuggingFace API
-        print("Generating caption...")
         raw_caption = generate_caption(image)
-        print(f"Raw caption: {raw_caption}")
+        logger.debug("Raw caption: %s", raw_caption)
 
         # 5. Format description
-        if raw_caption:
-            c = raw_caption[0].lower()
-            description = f"This image shows {c}{raw_caption[1:]}"
-            if not description.endswith("."):
-                description += "."
-        else:
-            description = "The image could not be described."
+        description, description_lower = format_description(raw_caption)
+        logger.debug("Description: %s", description)
 
-        print(f"Description: {description}")
+        # 6. Queue audio — synthesized in the background. Queued as soon as
+        #    the description exists so TTS overlaps the rest of the request.
+        #    Clients that speak the description locally (Web Speech API)
+        #    pass ?audio=false.
+        audio_url, audio_ready = None, False
+        if request.args.get("audio", "true").lower() != "false":
+            filename, audio_ready = queue_audio(description)
+            audio_url = f"/static/audio/{filename}"
 
-        # 6. Hazard scan
-        hazard = check_for_hazards(image, scene_description=description)
-
-        # 7. Generate audio
-        audio_filename = generate_audio(description, AUDIO_DIR)
-        cleanup_old_audio(AUDIO_DIR, keep_latest=10)
+        # 7. Hazard scan
+        hazard = check_for_hazards(
+            None,
+            scene_description=description,
+            scene_description_lower=description_lower,
+        )
 
         # 8. Return
         return jsonify({
             "description": description,
-            "audio_url":   f"/static/audio/{audio_filename}",
+            "audio_url":   audio_url,
+            "audio_ready": audio_ready,
             "hazard":      hazard,
         })
 
     except Exception as e:
-        print(f"ERROR:\n{traceback.format_exc()}")
+        logger.exception("Processing failed")
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/static/audio/<filename>", methods=["GET"])
 def serve_audio(filename):
-    return send_from_directory(AUDIO_DIR, filename, mimetype="audio/mpeg")
+    path = os.path.join(AUDIO_DIR, filename)
+    if not os.path.exists(path) and _is_pending(_pending_marker(filename)):
+        resp = jsonify({"status": "Audio is still being generated."})
+        resp.headers["Retry-After"] = "1"
+        return resp, 503
+    return send_from_directory(AUDIO_DIR, filename, mimetype=AUDIO_MIMETYPE)
 
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
-    print(f"Starting VisionVoice on port {port}")
-    app.run(host="0.0.0.0", port=port, debug=False)
+
+    if os.environ.get("FLASK_ENV") == "development":
+        logger.info("Starting VisionVoice (Flask dev server) on port %s", port)
+        app.run(host="0.0.0.0", port=port, debug=False)
+    else:
+        # Requests spend most of their time waiting on HuggingFace, so async
+        # gevent workers let many uploads overlap that wait. The model stays
+        # lazily loaded (ensure_model_loaded) — nothing is preloaded per fork.
+        logger.info("Starting VisionVoice (gunicorn + gevent) on port %s", port)
+        os.execvp("gunicorn", [
+            "gunicorn",
+            "-k", "gevent",
+            "-w", "2",
+            "--worker-connections", "100",
+            "--timeout", "120",
+            "-b", f"0.0.0.0:{port}",
+            "app:app",
+        ])
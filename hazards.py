@@ -0,0 +1,337 @@
+# hazards.py
+# Scans a scene description for danger keywords (fire, stairs, traffic...).
+# Pure text matching on the caption — no extra API call. The keyword table and
+# scanner are built once at import and shared by every request.
+
+import re
+import sys
+import array
+import logging
+import functools
+from types import MappingProxyType
+
+# Optional: pyahocorasick. When missing, the hazard scan falls back to
+# splitting the text into words and looking each one up (see _find_hazards).
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+__all__ = ["HAZARD_KEYWORDS", "check_for_hazards"]
+
+logger = logging.getLogger(__name__)
+
+
+# ── Hazard detection — scans caption text for danger keywords ─────────────────
+# Priority levels: 1=critical, 2=serious, 3=high, 4=medium, 5=low
+# Returns the HIGHEST priority (lowest number) hazard found.
+# Keywords match whole words only (plus a plural "s"/"es"), so compounds such
+# as "handgun" or "stairwell", irregular plurals ("children", "knives") and
+# other inflections ("flooding", "crowded", "electricity") need their own
+# entries.
+
+HAZARD_KEYWORDS = {
+    # PRIORITY 1 — CRITICAL
+    "fire":        (1, "fire detected — move away immediately", "🔥"),
+    "flame":       (1, "fire detected — move away immediately", "🔥"),
+    "flames":      (1, "fire detected — move away immediately", "🔥"),
+    "flaming":     (1, "fire detected — move away immediately", "🔥"),
+    "burning":     (1, "fire detected — move away immediately", "🔥"),
+    "burn":        (1, "fire detected — move away immediately", "🔥"),
+    "burned":      (1, "fire detected — move away immediately", "🔥"),
+    "burnt":       (1, "fire detected — move away immediately", "🔥"),
+    "campfire":    (1, "fire detected — move away immediately", "🔥"),
+    "bonfire":     (1, "fire detected — move away immediately", "🔥"),
+    "wildfire":    (1, "fire detected — move away immediately", "🔥"),
+    "firepit":     (1, "fire detected — move away immediately", "🔥"),
+    "firetruck":   (1, "fire detected — move away immediately", "🔥"),
+    "fireplace":   (1, "fire detected — move away immediately", "🔥"),
+    "fireworks":   (1, "fire detected — move away immediately", "🔥"),
+    "firefighter": (1, "fire detected — move away immediately", "🔥"),
+    "smoke":       (1, "smoke detected — possible fire nearby", "💨"),
+    "smoky":       (1, "smoke detected — possible fire nearby", "💨"),
+    "explosion":   (1, "explosion risk — move away",            "💥"),
+    "exploding":   (1, "explosion risk — move away",            "💥"),
+    "explosive":   (1, "explosion risk — move away",            "💥"),
+    "electric":    (1, "electrical hazard nearby",              "⚡"),
+    "electrical":  (1, "electrical hazard nearby",              "⚡"),
+    "electricity": (1, "electrical hazard nearby",              "⚡"),
+    "sparks":      (1, "electrical sparks — do not touch",      "⚡"),
+    "spark":       (1, "electrical sparks — do not touch",      "⚡"),
+    "sparking":    (1, "electrical sparks — do not touch",      "⚡"),
+    "chemical":    (1, "chemical hazard nearby",                "☣️"),
+    "toxic":       (1, "toxic material nearby",                 "☣️"),
+    "gun":         (1, "weapon detected nearby",                "🚨"),
+    "handgun":     (1, "weapon detected nearby",                "🚨"),
+    "shotgun":     (1, "weapon detected nearby",                "🚨"),
+    "gunman":      (1, "weapon detected nearby",                "🚨"),
+    "gunfire":     (1, "weapon detected nearby",                "🚨"),
+    "weapon":      (1, "weapon detected nearby",                "🚨"),
+    "knife":       (1, "sharp weapon nearby",                   "🚨"),
+    "knives":      (1, "sharp weapon nearby",                   "🚨"),
+    "flood":       (1, "flooding detected — avoid area",        "🌊"),
+    "flooded":     (1, "flooding detected — avoid area",        "🌊"),
+    "flooding":    (1, "flooding detected — avoid area",        "🌊"),
+    "floodwater":  (1, "flooding detected — avoid area",        "🌊"),
+
+    # PRIORITY 2 — SERIOUS
+    "car":         (2, "vehicle nearby — stop and wait",        "🚗"),
+    "truck":       (2, "large vehicle nearby",                  "🚛"),
+    "bus":         (2, "bus nearby — stop and wait",            "🚌"),
+    "van":         (2, "vehicle nearby — stop and wait",        "🚗"),
+    "motorcycle":  (2, "motorcycle nearby — be careful",        "🏍️"),
+    "motorbike":   (2, "motorcycle nearby — be careful",        "🏍️"),
+    "vehicle":     (2, "vehicle nearby — stop and wait",        "🚗"),
+    "traffic":     (2, "traffic ahead — do not cross",          "🚦"),
+    "road":        (2, "road ahead — watch for vehicles",       "🛣️"),
+    "street":      (2, "street ahead — watch for traffic",      "🛣️"),
+    "train":       (2, "train nearby — stay clear of tracks",   "🚆"),
+    "track":       (2, "train track — cross carefully",         "🚆"),
+    "railroad":    (2, "train track — cross carefully",         "🚆"),
+    "railway":     (2, "train track — cross carefully",         "🚆"),
+    "crowd":       (2, "crowd ahead — move carefully",          "👥"),
+    "crowded":     (2, "crowd ahead — move carefully",          "👥"),
+
+    # PRIORITY 3 — HIGH
+    "stair":       (3, "stairs ahead — hold the railing",       "🪜"),
+    "stairs":      (3, "stairs ahead — hold the railing",       "🪜"),
+    "staircase":   (3, "staircase ahead — hold the railing",    "🪜"),
+    "stairway":    (3, "stairway ahead — hold the railing",     "🪜"),
+    "stairwell":   (3, "stairs ahead — hold the railing",       "🪜"),
+    "step":        (3, "step ahead — watch your footing",       "⚠️"),
+    "steps":       (3, "steps ahead — watch your footing",      "⚠️"),
+    "stepping":    (3, "step ahead — watch your footing",       "⚠️"),
+    "stepped":     (3, "step ahead — watch your footing",       "⚠️"),
+    "doorstep":    (3, "step ahead — watch your footing",       "⚠️"),
+    "escalator":   (3, "escalator ahead — hold the railing",    "🪜"),
+    "ladder":      (3, "ladder nearby — be careful",            "🪜"),
+    "stepladder":  (3, "ladder nearby — be careful",            "🪜"),
+    "ramp":        (3, "ramp ahead — uneven surface",           "⚠️"),
+    "cliff":       (3, "drop ahead — stay back",                "🏔️"),
+    "ledge":       (3, "ledge ahead — stay back",               "⚠️"),
+    "drop":        (3, "drop ahead — stay back",                "⚠️"),
+    "pit":         (3, "pit ahead — do not step forward",       "⚠️"),
+    "hole":        (3, "hole in floor — do not step",           "⚠️"),
+    "gap":         (3, "gap ahead — do not step",               "⚠️"),
+    "ditch":       (3, "ditch ahead — step carefully",          "⚠️"),
+    "manhole":     (3, "manhole ahead — avoid",                 "⚠️"),
+    "wet":         (3, "wet surface — slip risk",               "💧"),
+    "slippery":    (3, "slippery surface — slow down",          "💧"),
+    "puddle":      (3, "puddle on ground",                      "💧"),
+    "spill":       (3, "spill on floor — slip risk",            "💧"),
+    "spilled":     (3, "spill on floor — slip risk",            "💧"),
+    "spilling":    (3, "spill on floor — slip risk",            "💧"),
+    "ice":         (3, "ice on ground — slip risk",             "🧊"),
+    "icy":         (3, "icy surface — slip risk",               "🧊"),
+    "snow":        (3, "snow on ground — slippery",             "❄️"),
+    "snowy":       (3, "snow on ground — slippery",             "❄️"),
+    "snowing":     (3, "snow on ground — slippery",             "❄️"),
+    "mud":         (3, "muddy ground — slippery",               "⚠️"),
+    "muddy":       (3, "muddy ground — slippery",               "⚠️"),
+
+    # PRIORITY 4 — MEDIUM
+    "door":        (4, "door ahead",                            "🚪"),
+    "doorway":     (4, "doorway ahead",                         "🚪"),
+    "entrance":    (4, "entrance ahead",                        "🚪"),
+    "exit":        (4, "exit ahead",                            "🚪"),
+    "gate":        (4, "gate ahead",                            "🚧"),
+    "turnstile":   (4, "turnstile ahead",                       "🚧"),
+    "wall":        (4, "wall ahead — stop",                     "🧱"),
+    "fence":       (4, "fence ahead",                           "🚧"),
+    "barrier":     (4, "barrier ahead",                         "🚧"),
+    "bollard":     (4, "bollard in path",                       "🚧"),
+    "pole":        (4, "pole in path",                          "⚠️"),
+    "pillar":      (4, "pillar ahead",                          "⚠️"),
+    "column":      (4, "column ahead",                          "⚠️"),
+    "beam":        (4, "beam overhead — duck",                  "⚠️"),
+    "pipe":        (4, "pipe in path",                          "⚠️"),
+    "construction":(4, "construction zone — be careful",        "🏗️"),
+    "scaffold":    (4, "scaffolding overhead",                  "🏗️"),
+    "dog":         (4, "dog nearby — approach carefully",       "🐕"),
+    "animal":      (4, "animal nearby — be cautious",           "🐾"),
+    "snake":       (4, "snake nearby — do not approach",        "🐍"),
+    "person":      (4, "person directly ahead — slow down",     "🧍"),
+    "people":      (4, "people ahead — slow down",              "👥"),
+    "child":       (4, "child nearby — be extra careful",       "👶"),
+    "children":    (4, "child nearby — be extra careful",       "👶"),
+    "baby":        (4, "baby nearby — be extra careful",        "👶"),
+    "bicycle":     (4, "bicycle nearby",                        "🚲"),
+    "bike":        (4, "bicycle nearby",                        "🚲"),
+    "glass":       (4, "glass nearby — be careful",             "⚠️"),
+    "broken":      (4, "broken object nearby",                  "⚠️"),
+    "sharp":       (4, "sharp object nearby",                   "⚠️"),
+    "debris":      (4, "debris on ground",                      "⚠️"),
+    "rubble":      (4, "rubble on ground",                      "⚠️"),
+
+    # PRIORITY 5 — LOW
+    "chair":       (5, "chair in path",                         "🪑"),
+    "stool":       (5, "stool in path",                         "🪑"),
+    "table":       (5, "table ahead",                           "🪑"),
+    "desk":        (5, "desk ahead",                            "🪑"),
+    "bench":       (5, "bench ahead",                           "🪑"),
+    "sofa":        (5, "sofa in path",                          "🛋️"),
+    "couch":       (5, "couch in path",                         "🛋️"),
+    "box":         (5, "box in path",                           "📦"),
+    "crate":       (5, "crate in path",                         "📦"),
+    "luggage":     (5, "luggage in path",                       "🧳"),
+    "suitcase":    (5, "suitcase in path",                      "🧳"),
+    "cord":        (5, "cord on ground — trip hazard",          "⚠️"),
+    "cable":       (5, "cable on ground — trip hazard",         "⚠️"),
+    "wire":        (5, "wire on ground — trip hazard",          "⚠️"),
+    "hose":        (5, "hose on ground — trip hazard",          "⚠️"),
+    "rope":        (5, "rope on ground — trip hazard",          "⚠️"),
+    "mat":         (5, "mat on floor — edge risk",              "⚠️"),
+    "rug":         (5, "rug on floor — edge risk",              "⚠️"),
+    "carpet":      (5, "carpet edge — trip risk",               "⚠️"),
+    "clutter":     (5, "clutter on floor",                      "⚠️"),
+}
+
+# Read-only view: the tables below and _scan_lower's cache assume the keyword
+# set never changes after import.
+HAZARD_KEYWORDS = MappingProxyType(HAZARD_KEYWORDS)
+
+
+# Parallel arrays (struct-of-arrays) indexed by keyword id. The scan only
+# compares the packed uint8 priorities; label and emoji are read once, for
+# the winning keyword. Ids are frozen in ascending priority order; keyword,
+# label and emoji strings are interned and held in tuples.
+_KW_LIST = tuple(
+    sys.intern(k) for k in sorted(HAZARD_KEYWORDS, key=lambda k: HAZARD_KEYWORDS[k][0])
+)
+_KW_ID   = {keyword: i for i, keyword in enumerate(_KW_LIST)}
+_PRI     = array.array("B", (HAZARD_KEYWORDS[k][0] for k in _KW_LIST))
+_LABEL   = tuple(sys.intern(HAZARD_KEYWORDS[k][1]) for k in _KW_LIST)
+_EMOJI   = tuple(sys.intern(HAZARD_KEYWORDS[k][2]) for k in _KW_LIST)
+_TOP_PRI = _PRI[0]   # best priority any keyword has — nothing can beat it
+
+# Cheap pre-checks: text shorter than the shortest keyword, or containing
+# none of the characters a keyword can start with, cannot match anything.
+_MIN_KW      = min(map(len, HAZARD_KEYWORDS))
+_FIRST_CHARS = frozenset(k[0] for k in HAZARD_KEYWORDS)
+
+
+def _build_hazard_automaton() -> "ahocorasick.Automaton":
+    """Compile every hazard keyword into one Aho-Corasick automaton."""
+    automaton = ahocorasick.Automaton()
+    for kw_id, keyword in enumerate(_KW_LIST):
+        automaton.add_word(keyword, (kw_id, len(keyword)))
+    automaton.make_automaton()
+    return automaton
+
+
+def _is_whole_word(text: str, start: int, end: int) -> bool:
+    """
+    True if text[start:end] is a whole word, allowing a plural "s"/"es".
+    Stops "car" matching inside "carpet" while still matching "cars".
+    """
+    if start > 0 and text[start - 1].isalpha():
+        return False
+    for suffix in ("", "s", "es"):
+        stop = end + len(suffix)
+        if text.startswith(suffix, end) and (stop >= len(text) or not text[stop].isalpha()):
+            return True
+    return False
+
+
+# Built once at import — a scan is then a single linear pass over the text.
+# _find_hazards yields candidate (kw_id, start, end) hits; _confirm_hit does
+# any remaining whole-word check, so the scan can skip it for hits whose
+# priority cannot beat the current best.
+if ahocorasick is not None:
+    _HAZARD_AUTOMATON = _build_hazard_automaton()
+
+    def _find_hazards(text: str):
+        for end, (kw_id, length) in _HAZARD_AUTOMATON.iter(text):
+            yield kw_id, end - length + 1, end + 1
+
+    _confirm_hit = _is_whole_word
+else:
+    # Every keyword is a single word, so tokenizing once and doing one dict
+    # lookup per word finds exactly the whole-word hits. _WORD_FORMS maps each
+    # keyword and its plural forms to a keyword id; built from the lowest
+    # priority up so the best-priority keyword wins when forms collide.
+    _WORD_RE    = re.compile(r"[^\W\d_]+")
+    _WORD_FORMS = {
+        form: kw_id
+        for kw_id in reversed(range(len(_KW_LIST)))
+        for form in (_KW_LIST[kw_id], _KW_LIST[kw_id] + "s", _KW_LIST[kw_id] + "es")
+    }
+
+    def _find_hazards(text: str):
+        for match in _WORD_RE.finditer(text):
+            kw_id = _WORD_FORMS.get(match.group())
+            if kw_id is not None:
+                yield kw_id, match.start(), match.end()
+
+    def _confirm_hit(text: str, start: int, end: int) -> bool:
+        return True   # tokens are already whole words
+
+
+@functools.lru_cache(maxsize=512)
+def _scan_lower(text: str) -> int:
+    """
+    Return the keyword id of the highest-priority hazard in already
+    lowercased text, or -1. Pure (HAZARD_KEYWORDS is fixed at runtime), so
+    repeated captions — common with webcam frames — are served from cache.
+    """
+    best_priority = 99
+    best_id       = -1
+
+    for kw_id, start, end in _find_hazards(text):
+        priority = _PRI[kw_id]
+        if priority >= best_priority or not _confirm_hit(text, start, end):
+            continue
+        best_priority = priority
+        best_id       = kw_id
+        if priority == _TOP_PRI:
+            break   # nothing can outrank it, stop scanning
+
+    return best_id
+
+
+def _no_hazard() -> dict:
+    return {
+        "hazard_detected": False,
+        "hazard_type":     "",
+        "hazard_emoji":    "",
+        "hazard_priority": 99,
+        "matched_keyword": "",
+    }
+
+
+def check_for_hazards(
+    image,
+    scene_description: str = "",
+    scene_description_lower: str = None,
+) -> dict:
+    """
+    Scan the scene description for the highest-priority hazard keyword.
+    No extra API call needed — uses the caption already generated.
+    Pass scene_description_lower (from format_description) to skip lowering.
+    """
+    if not scene_description or len(scene_description) < _MIN_KW:
+        return _no_hazard()
+
+    text = (scene_description_lower or scene_description.lower()).strip()
+    if len(text) < _MIN_KW or not any(c in _FIRST_CHARS for c in text):
+        return _no_hazard()
+    logger.debug("Hazard scan: '%.80s...'", text)
+
+    best_id       = _scan_lower(text)
+    best_priority = _PRI[best_id]     if best_id >= 0 else 99
+    best_keyword  = _KW_LIST[best_id] if best_id >= 0 else ""
+    best_label    = _LABEL[best_id]   if best_id >= 0 else ""
+    best_emoji    = _EMOJI[best_id]   if best_id >= 0 else ""
+
+    if best_label:
+        logger.debug("Hazard: priority=%d '%s' → '%s'", best_priority, best_keyword, best_label)
+    else:
+        logger.debug("Hazard: none found")
+
+    return {
+        "hazard_detected": bool(best_label),
+        "hazard_type":     best_label,
+        "hazard_emoji":    best_emoji,
+        "hazard_priority": best_priority,
+        "matched_keyword": best_keyword,
+    }
@@ -8,12 +8,151 @@
 import os
 import io
 import time
+import email.utils
+import asyncio
+import hashlib
+import collections
+import logging
+import threading
+import aiohttp
 import requests
-from PIL import Image
+import diskcache
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+import PIL
+from PIL import Image, features
+
+# Optional: PyTurboJPEG (needs the system libturbojpeg). When available,
+# uploaded JPEGs are decoded with libjpeg-turbo's SIMD IDCT and scaled down
+# during decode, and JPEG uploads to HF are encoded with it too. Without it,
+# Pillow does both.
+try:
+    import numpy as np
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJSAMP_420, TJCS_CMYK, TJCS_YCCK
+    _TURBOJPEG = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _TURBOJPEG = None
+
+# Optional: orjson parses the HF response straight from bytes, several times
+# faster than the stdlib json module.
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    import json
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
 
 HF_TOKEN   = os.environ.get("HF_API_TOKEN", "")
 HF_API_URL = "https://api-inference.huggingface.co/models/Salesforce/blip-image-captioning-large"
 
+# Upload format. WebP is ~25-35% smaller than JPEG at the same perceived
+# quality; if HF ever answers 415 we switch to JPEG for the rest of the
+# process (see _use_jpeg_uploads).
+_upload_format = "WEBP" if features.check("webp") else "JPEG"
+_CONTENT_TYPES = {"WEBP": "image/webp", "JPEG": "image/jpeg"}
+
+
+class _NoTokenHeaders(dict):
+    """Stands in for _HEADERS when HF_API_TOKEN is unset: any lookup raises."""
+
+    def __missing__(self, fmt):
+        raise RuntimeError("HF_API_TOKEN not set in Render environment.")
+
+
+# HF_TOKEN never changes at runtime, so the request headers are built once.
+# Without a token, the header lookup in the request path raises instead of a
+# per-call check; load_model still rejects a missing token at startup.
+_HEADERS = {
+    fmt: {
+        "Authorization": f"Bearer {HF_TOKEN}",
+        "Content-Type":  content_type,
+    }
+    for fmt, content_type in _CONTENT_TYPES.items()
+} if HF_TOKEN else _NoTokenHeaders()
+
+# One pooled session for all HF calls — keeps TCP+TLS connections alive
+# between requests. The Retry adapter waits out 503 "model loading" and
+# transient 429/502/504 replies with exponential backoff (0s, 3s, 6s, 12s,
+# 24s), honouring Retry-After when HF sends it. Only those statuses use the
+# retry budget: a read timeout is not retried (the POST may already be running
+# on HF, and each retry would re-upload the image and wait out HF_TIMEOUT
+# again), and a failed connect is retried once.
+HF_RETRIES        = 5
+HF_BACKOFF        = 1.5
+HF_RETRY_STATUSES = (429, 502, 503, 504)
+
+# Keep-alive connections held open to HF, shared by the sync and async
+# clients. Only one host is ever contacted, so a single host pool suffices.
+HF_POOL_SIZE = int(os.environ.get("HF_POOL_SIZE", 16))
+
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=HF_POOL_SIZE,
+    max_retries=Retry(
+        total=HF_RETRIES,
+        connect=1,
+        read=False,
+        backoff_factor=HF_BACKOFF,
+        status_forcelist=HF_RETRY_STATUSES,
+        allowed_methods=["POST"],
+        raise_on_status=False,
+    ),
+))
+
+# (connect, read) — fail fast if HF is unreachable, allow slow generations
+HF_TIMEOUT = (5, 60)
+
+# Longest side sent to HuggingFace — BLIP runs at 384x384, so more pixels
+# than that are only upload bandwidth
+MAX_DIM = 384
+
+# Captions are cached on disk so repeat uploads skip the HF round-trip.
+# Keys are the SHA-256 of the normalized (resized + re-encoded) upload. No
+# perceptual near-duplicate key: flat or dark frames would all share one and
+# get a stale caption — unacceptable when the caption drives hazard alerts.
+CAPTION_CACHE_DIR = os.environ.get(
+    "CAPTION_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), "cache", "captions"),
+)
+CAPTION_CACHE_TTL = 7 * 86400   # one week
+_caption_cache = diskcache.Cache(
+    CAPTION_CACHE_DIR,
+    eviction_policy="least-recently-used",
+    size_limit=64 * 1024 * 1024,
+)
+
+# In-process LRU in front of the disk cache, keyed by a hash of the decoded
+# pixels (or of the raw bytes, for byte uploads): a repeat upload skips the
+# resize, encode and disk lookup entirely.
+CAPTION_MEMORY_SIZE = 64
+_recent_captions    = collections.OrderedDict()
+_recent_lock        = threading.Lock()
+
+# Raw JPEG uploads at most this big and already within MAX_DIM are sent to HF
+# unchanged (see _passthrough_upload).
+PASSTHROUGH_MAX_BYTES = 400 * 1024
+
+# Micro-batching for the async path: concurrent caption requests arriving
+# within this window are dispatched together (see AsyncCaptionBatcher).
+CAPTION_BATCH_SIZE       = int(os.environ.get("CAPTION_BATCH_SIZE", 8))
+CAPTION_BATCH_LATENCY_MS = int(os.environ.get("CAPTION_BATCH_LATENCY_MS", 20))
+
+
+def _tiny_jpeg() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), (128, 128, 128)).save(buf, format="JPEG", quality=50)
+    return buf.getvalue()
+
+
+# Tiny image posted once at startup so HF loads the model (its ~20-30s
+# "model is loading" 503) before the first real user request arrives.
+_TINY_JPEG = _tiny_jpeg()
+
 
 def load_model():
     """Validate token exists. No local model to load — runs on HF servers."""
@@ -22,80 +161,218 @@ def load_model():
             "HF_API_TOKEN not set. "
             "Go to Render → your service → Environment → Add HF_API_TOKEN."
         )
-    print("HuggingFace API mode ready. Token found.")
+    logger.info("HuggingFace API mode ready. Token found.")
+    _report_image_codecs()
+    threading.Thread(target=_warmup, daemon=True).start()
+
+
+def _warmup():
+    """Wake the HF model in the background; the session retries its 503s."""
+    try:
+        resp = _SESSION.post(
+            HF_API_URL,
+            headers=_HEADERS["JPEG"],
+            data=_TINY_JPEG,
+            timeout=HF_TIMEOUT,
+        )
+        logger.info("HF warmup: %s", resp.status_code)
+    except Exception as e:
+        logger.info("HF warmup failed (non-critical): %s", e)
 
 
-def generate_caption(image: Image.Image) -> str:
+def _report_image_codecs():
     """
-    Send image to HuggingFace Inference API, receive caption text.
-    Retries up to 3 times to handle 503 model-loading delays on HF side.
+    Log which accelerated codecs Pillow was built with. Stock Pillow wheels
+    bundle libjpeg-turbo (SIMD JPEG decode/encode); a source build against
+    plain libjpeg is several times slower on the upload path. Pillow-SIMD
+    (version suffix ".postN") is a drop-in replacement that also speeds up
+    resampling.
     """
-    if not HF_TOKEN:
-        raise RuntimeError("HF_API_TOKEN not set in Render environment.")
+    turbo = features.check_feature("libjpeg_turbo")
+    logger.info(
+        "Pillow %s%s: libjpeg-turbo=%s, webp=%s, PyTurboJPEG=%s",
+        PIL.__version__,
+        " (Pillow-SIMD)" if ".post" in PIL.__version__ else "",
+        "yes" if turbo else "NO",
+        "yes" if features.check("webp") else "no",
+        "yes" if _TURBOJPEG is not None else "no",
+    )
+    if not turbo:
+        logger.warning("Pillow lacks libjpeg-turbo — JPEG decode/encode will be slow.")
+
+
+def _turbo_scaling_factor(width: int, height: int) -> tuple:
+    """Smallest libjpeg-turbo DCT scale that keeps the longest side >= MAX_DIM."""
+    longest = max(width, height)
+    candidates = [
+        (num, den) for num, den in _TURBOJPEG.scaling_factors
+        if num <= den and longest * num >= MAX_DIM * den
+    ]
+    return min(candidates, key=lambda f: f[0] / f[1], default=(1, 1))
+
+
+def decode_image(source) -> Image.Image:
+    """
+    Decode an uploaded image (bytes or a binary file object such as Flask's
+    upload stream) into an RGB PIL image.
+    JPEGs take the libjpeg-turbo path when PyTurboJPEG is installed, scaling
+    by 1/2, 1/4 or 1/8 in the DCT domain instead of decoding full size.
+    """
+    if _TURBOJPEG is not None:
+        # TurboJPEG needs the whole buffer in memory
+        data = source if isinstance(source, (bytes, bytearray)) else source.read()
+        if data[:3] == b"\xff\xd8\xff":
+            width, height, _, colorspace = _TURBOJPEG.decode_header(data)
+            # libjpeg-turbo can't convert CMYK/YCCK (Adobe) JPEGs to RGB;
+            # those, and anything else it rejects, go to Pillow below
+            if colorspace not in (TJCS_CMYK, TJCS_YCCK):
+                try:
+                    pixels = _TURBOJPEG.decode(
+                        data,
+                        pixel_format=TJPF_RGB,
+                        scaling_factor=_turbo_scaling_factor(width, height),
+                    )
+                    return Image.fromarray(pixels)
+                except OSError as e:
+                    logger.debug("TurboJPEG decode failed (%s) — using Pillow.", e)
+        source = data
+
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    # Pillow path: reads the stream lazily — no extra full-size bytes copy.
+    # draft() lets libjpeg pick the nearest 1/N IDCT scale that still covers
+    # MAX_DIM, so phone photos never decode at full size.
+    # No-op for non-JPEG formats.
+    image = Image.open(source)
+    image.draft("RGB", (MAX_DIM, MAX_DIM))
+    return image.convert("RGB")
+
+
+class CaptionCoalescer:
+    """
+    Runs caption requests as soon as they arrive, on a worker pool; concurrent
+    requests for the same key (identical uploads) share a single HF call.
 
-    # Resize to max 512px — speeds up transfer, HF resizes anyway
-    MAX_DIM = 512
-    w, h = image.size
-    if w > MAX_DIM or h > MAX_DIM:
-        scale = MAX_DIM / max(w, h)
-        image = image.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
+    The serverless HF endpoint takes one image per POST and gevent already
+    overlaps concurrent calls, so nothing is held back to form a batch.
+    """
 
-    # Convert PIL image → JPEG bytes
-    buf = io.BytesIO()
-    image.save(buf, format="JPEG", quality=85)
-    image_bytes = buf.getvalue()
-    print(f"Sending {len(image_bytes) // 1024}KB to HuggingFace...")
+    def __init__(self, fn, max_workers: int):
+        self._fn       = fn
+        self._pool     = ThreadPoolExecutor(max_workers=max_workers)
+        self._inflight = {}
+        self._lock     = threading.Lock()
+
+    def submit(self, key: str, payload) -> Future:
+        """Start a call, or join the in-flight call with the same key."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                logger.debug("Caption request joined an in-flight HF call")
+                return future
+            future = self._inflight[key] = Future()
+        self._pool.submit(self._call, key, payload, future)
+        return future
+
+    def _call(self, key, payload, future):
+        try:
+            result = self._fn(payload)
+        except Exception as e:
+            self._finish(key)
+            future.set_exception(e)
+        else:
+            self._finish(key)
+            future.set_result(result)
 
-    headers = {
-        "Authorization": f"Bearer {HF_TOKEN}",
-        "Content-Type":  "image/jpeg",
-    }
+    def _finish(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
 
-    for attempt in range(1, 4):   # try up to 3 times
-        try:
-            resp = requests.post(
-                HF_API_URL,
-                headers=headers,
-                data=image_bytes,
-                timeout=60,
-            )
-        except requests.exceptions.Timeout:
-            raise RuntimeError("HuggingFace API timed out after 60s. Try again.")
-        except requests.exceptions.ConnectionError as e:
-            raise RuntimeError(f"Cannot reach HuggingFace API: {e}")
 
-        print(f"HF response (attempt {attempt}): {resp.status_code} — {resp.text[:120]}")
+class _UnsupportedUpload(Exception):
+    """HF rejected the upload's image format (415)."""
 
-        if resp.status_code == 200:
-            break   # success
 
-        if resp.status_code == 503:
-            # Model is loading on HF side — normal on first use
-            wait = 20 * attempt
-            print(f"HF model loading, waiting {wait}s before retry...")
-            time.sleep(wait)
-            continue
+def _use_jpeg_uploads():
+    global _upload_format
+    if _upload_format != "JPEG":
+        logger.warning("HF rejected WebP uploads (415) — switching to JPEG.")
+        _upload_format = "JPEG"
 
-        if resp.status_code == 401:
-            raise RuntimeError(
-                "HuggingFace token rejected (401). "
-                "Check HF_API_TOKEN value in Render → Environment."
-            )
 
-        # Any other error — raise immediately
-        raise RuntimeError(
-            f"HuggingFace API returned {resp.status_code}: {resp.text[:300]}"
+def _encode_upload(image: Image.Image, fmt: str) -> io.BytesIO:
+    """
+    Encode an RGB image for HF. BLIP resizes to 384x384 internally, so
+    WebP q75 or JPEG q75 with 4:2:0 chroma is indistinguishable and much
+    smaller; JPEG optimize/progressive passes are skipped to keep it cheap.
+    EXIF and ICC metadata are never written — BLIP only reads the pixels.
+    """
+    if fmt == "JPEG" and _TURBOJPEG is not None:
+        # TurboJPEG writes no metadata segments at all
+        return io.BytesIO(_TURBOJPEG.encode(
+            np.asarray(image),
+            quality=75,
+            pixel_format=TJPF_RGB,
+            jpeg_subsample=TJSAMP_420,
+        ))
+
+    buf = io.BytesIO()
+    if fmt == "WEBP":
+        image.save(buf, format="WEBP", quality=75, method=4, exif=b"", icc_profile=None)
+    else:
+        image.save(
+            buf,
+            format="JPEG",
+            quality=75,
+            subsampling=2,
+            optimize=False,
+            progressive=False,
+            exif=b"",
+            icc_profile=None,
         )
+    return buf
+
+
+def _reencode_as_jpeg(data) -> io.BytesIO:
+    """Re-encode a rejected WebP upload (BytesIO or bytes) as JPEG."""
+    _use_jpeg_uploads()
+    if isinstance(data, io.BytesIO):
+        data.seek(0)
     else:
+        data = io.BytesIO(data)
+    return _encode_upload(Image.open(data).convert("RGB"), "JPEG")
+
+
+def _check_hf_status(status_code: int, text: str):
+    """Raise a readable RuntimeError for any non-200 HF reply."""
+    if status_code == 200:
+        return
+
+    if status_code == 415:
+        raise _UnsupportedUpload()
+
+    if status_code == 401:
+        raise RuntimeError(
+            "HuggingFace token rejected (401). "
+            "Check HF_API_TOKEN value in Render → Environment."
+        )
+
+    if status_code in HF_RETRY_STATUSES:
+        # Still failing after retries
         raise RuntimeError(
-            "HuggingFace model did not respond after 3 attempts. "
-            "Wait a minute and try again."
+            f"HuggingFace model did not respond after {HF_RETRIES} retries "
+            f"({status_code}). Wait a minute and try again."
         )
 
-    # Parse response — HF returns: [{"generated_text": "a person sitting..."}]
-    result = resp.json()
-    print(f"HF result: {result}")
+    raise RuntimeError(
+        f"HuggingFace API returned {status_code}: {text[:300]}"
+    )
 
+
+def _parse_caption(result) -> str:
+    """Extract and tidy the caption from HF's JSON reply."""
+    # HF returns: [{"generated_text": "a person sitting..."}]
     if isinstance(result, list) and result:
         caption = result[0].get("generated_text", "")
     elif isinstance(result, dict):
@@ -103,177 +380,401 @@ def generate_caption(image: Image.Image) -> str:
     else:
         caption = str(result)
 
-    # Clean up text
+    return _normalize_caption(caption)
+
+
+def _normalize_caption(caption: str) -> str:
+    """Strip, capitalize and end with punctuation — at most one new string."""
     caption = caption.strip()
-    if caption and not caption[0].isupper():
-        caption = caption[0].upper() + caption[1:]
-    if caption and not caption.endswith("."):
-        caption += "."
+    if not caption:
+        return caption
+    first    = caption[0]
+    need_cap = first.islower()
+    need_dot = caption[-1] not in ".!?"
+    if need_cap and need_dot:
+        return first.upper() + caption[1:] + "."
+    if need_cap:
+        return first.upper() + caption[1:]
+    if need_dot:
+        return caption + "."
+    return caption
+
+
+def _request_caption(payload: tuple) -> str:
+    """
+    POST an encoded image to the HuggingFace Inference API, return caption.
+    payload is (format, BytesIO); the buffer is streamed as-is (no bytes
+    copy) and urllib3 rewinds it on retry.
+    503 model-loading delays and other transient errors are retried by the
+    session's Retry adapter.
+    """
+    fmt, image_buf = payload
+    logger.debug("Sending %dKB %s to HuggingFace...", image_buf.getbuffer().nbytes // 1024, fmt)
+    image_buf.seek(0)
+
+    try:
+        resp = _SESSION.post(
+            HF_API_URL,
+            headers=_HEADERS[fmt],
+            data=image_buf,
+            timeout=HF_TIMEOUT,
+        )
+    except requests.exceptions.Timeout:
+        raise RuntimeError(f"HuggingFace API timed out after {HF_TIMEOUT[1]}s. Try again.")
+    except requests.exceptions.ConnectionError as e:
+        # requests reports a read timeout that ran out of retries as a
+        # ConnectionError around urllib3's MaxRetryError
+        if isinstance(getattr(e.args[0] if e.args else None, "reason", None), ReadTimeoutError):
+            raise RuntimeError(f"HuggingFace API timed out after {HF_TIMEOUT[1]}s. Try again.")
+        raise RuntimeError(f"Cannot reach HuggingFace API: {e}")
+
+    # resp.text re-decodes the body (with charset detection) on every access,
+    # so it is only touched for the debug log or an error message
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("HF response: %s — %.120s", resp.status_code, resp.text)
+    try:
+        if resp.status_code != 200:
+            _check_hf_status(resp.status_code, resp.text)
+    except _UnsupportedUpload:
+        if fmt == "JPEG":
+            raise RuntimeError("HuggingFace API rejected the JPEG upload (415).")
+        return _request_caption(("JPEG", _reencode_as_jpeg(image_buf)))
+
+    result = _loads(resp.content)
+    logger.debug("HF result: %s", result)
+    return _parse_caption(result)
+
+
+_caption_calls = CaptionCoalescer(_request_caption, max_workers=HF_POOL_SIZE)
+
+
+def _passthrough_upload(data: bytes):
+    """
+    Upload payload and cache key for a JPEG that can go to HF unchanged
+    (small, already within MAX_DIM and carrying no metadata), or None if it
+    needs re-encoding.
+    """
+    if len(data) > PASSTHROUGH_MAX_BYTES or data[:3] != b"\xff\xd8\xff":
+        return None
+    image = Image.open(io.BytesIO(data))   # parses the header only
+    if max(image.size) > MAX_DIM:
+        return None
+    # Only JFIF (APP0) and Adobe (APP14, needed to decode) segments may pass;
+    # EXIF/GPS (APP1), ICC (APP2), IPTC or comments force a re-encode, which
+    # strips them like every other upload (see _encode_upload)
+    if any(marker not in ("APP0", "APP14") for marker, _ in image.applist):
+        return None
 
-    print(f"Caption: {caption}")
+    return ("JPEG", io.BytesIO(data)), hashlib.sha256(data).hexdigest()
+
+
+def _prepare_upload(image) -> tuple:
+    """
+    Resize and encode an image (PIL image or raw upload bytes) for HF.
+    Returns ((fmt, buf), cache_key) — the upload payload plus its caption
+    cache key.
+    """
+    if isinstance(image, (bytes, bytearray)):
+        prepared = _passthrough_upload(image)
+        if prepared is not None:
+            return prepared
+        image = decode_image(image)
+
+    # Resize to max 384px — BLIP's input size, so HF sees the same pixels.
+    # After decode_image's DCT scaling this is only a small final pass;
+    # reducing_gap lets Pillow box-reduce by an integer factor first when the
+    # source is still large (PNG/WebP uploads skip DCT scaling). BILINEAR is
+    # enough here: BLIP resamples to 384x384 again on the server, so a
+    # LANCZOS pass would only cost CPU.
+    w, h = image.size
+    if w > MAX_DIM or h > MAX_DIM:
+        scale = MAX_DIM / max(w, h)
+        image = image.resize(
+            (int(w * scale), int(h * scale)),
+            Image.BILINEAR,
+            reducing_gap=2.0,
+        )
+
+    fmt = _upload_format
+    buf = _encode_upload(image, fmt)
+
+    # Hash after normalization (resize + re-encode) so duplicates collide
+    cache_key = hashlib.sha256(buf.getbuffer()).hexdigest()
+    return (fmt, buf), cache_key
+
+
+def _pixel_key(image) -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(image, (bytes, bytearray)):
+        digest.update(b"bytes:")
+        digest.update(image)
+    else:
+        # Raw pixel bytes alone don't identify an image: a flat 100x200 and
+        # 200x100 frame, or an L and RGB image, can share them
+        digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode())
+        digest.update(image.tobytes())
+    return digest.digest()
+
+
+def _recent_caption(pixel_key: bytes):
+    with _recent_lock:
+        caption = _recent_captions.get(pixel_key)
+        if caption is not None:
+            _recent_captions.move_to_end(pixel_key)
+    return caption
+
+
+def _remember_caption(pixel_key: bytes, caption: str):
+    if not caption:
+        return
+    with _recent_lock:
+        _recent_captions[pixel_key] = caption
+        _recent_captions.move_to_end(pixel_key)
+        while len(_recent_captions) > CAPTION_MEMORY_SIZE:
+            _recent_captions.popitem(last=False)
+
+
+def _cached_caption(cache_key: str):
+    cached = _caption_cache.get(cache_key)
+    if cached is not None:
+        logger.debug("Caption cache hit: %s", cached)
+    return cached
+
+
+def _store_caption(cache_key: str, caption: str):
+    if caption:
+        _caption_cache.set(cache_key, caption, expire=CAPTION_CACHE_TTL)
+    logger.debug("Caption: %s", caption)
+
+
+def generate_caption(image) -> str:
+    """
+    Send image to HuggingFace Inference API, receive caption text.
+    image is a PIL image or the raw upload bytes; small JPEG bytes are sent
+    as-is, skipping the decode/re-encode round-trip.
+    Cached captions are returned directly; misses go straight to the HF pool,
+    sharing the call with any identical upload already in flight.
+    """
+    pixel_key = _pixel_key(image)
+    caption   = _recent_caption(pixel_key)
+    if caption is not None:
+        return caption
+
+    payload, cache_key = _prepare_upload(image)
+    caption = _cached_caption(cache_key)
+    if caption is None:
+        caption = _caption_calls.submit(cache_key, payload).result()
+        _store_caption(cache_key, caption)
+    _remember_caption(pixel_key, caption)
+    return caption
+
+
+def generate_captions_batch(images: list) -> list:
+    """
+    Caption several images at once, e.g. frames from a video stream.
+    All cache misses are submitted up front so they go out concurrently;
+    captions come back in input order.
+    """
+    prepared = [_prepare_upload(image) for image in images]
+    found    = {}   # cache_key → caption, from the cache or a finished call
+    pending  = {}
+    for payload, cache_key in prepared:
+        if cache_key in found or cache_key in pending:
+            continue
+        caption = _cached_caption(cache_key)
+        if caption is None:
+            pending[cache_key] = _caption_calls.submit(cache_key, payload)
+        else:
+            found[cache_key] = caption
+
+    for cache_key, future in pending.items():
+        found[cache_key] = future.result()
+        _store_caption(cache_key, found[cache_key])
+    return [found[cache_key] for _, cache_key in prepared]
+
+
+# ── Async caption path — for asyncio callers (ASGI servers, scripts) ──────────
+
+class AsyncCaptionBatcher:
+    """
+    Async caption dispatch for the aiohttp path: requests arriving within
+    max_latency_ms (up to max_batch_size) are fanned out concurrently over
+    one aiohttp connection pool; identical payloads share one HF call.
+    """
+
+    def __init__(self, fn, max_batch_size: int, max_latency_ms: int):
+        self._fn             = fn
+        self._max_batch_size = max_batch_size
+        self._max_latency    = max_latency_ms / 1000
+        self._loop           = None
+        self._queue          = None
+        self._tasks          = set()
+
+    async def submit(self, key: str, payload):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or a new event loop (e.g. repeated asyncio.run)
+            self._loop  = loop
+            self._queue = asyncio.Queue()
+            self._spawn(self._run())
+        future = loop.create_future()
+        await self._queue.put((key, payload, future))
+        return await future
+
+    def _spawn(self, coro):
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self):
+        while True:
+            batch    = [await self._queue.get()]
+            deadline = self._loop.time() + self._max_latency
+            while len(batch) < self._max_batch_size:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            groups = {}
+            for key, payload, future in batch:
+                groups.setdefault(key, (payload, []))[1].append(future)
+            if len(batch) > 1:
+                logger.debug("Async caption batch: %d requests → %d HF calls", len(batch), len(groups))
+            for payload, futures in groups.values():
+                self._spawn(self._call(payload, futures))
+
+    async def _call(self, payload, futures):
+        try:
+            result = await self._fn(payload)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for future in futures:
+                if not future.done():
+                    future.set_result(result)
+
+
+_aiohttp_session = None
+_aiohttp_loop    = None
+
+
+def _get_aiohttp_session() -> "aiohttp.ClientSession":
+    """One pooled aiohttp session per event loop, created on first use."""
+    global _aiohttp_session, _aiohttp_loop
+    loop = asyncio.get_running_loop()
+    if _aiohttp_session is None or _aiohttp_session.closed or _aiohttp_loop is not loop:
+        _aiohttp_loop    = loop
+        _aiohttp_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=HF_POOL_SIZE, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=HF_TIMEOUT[1], connect=HF_TIMEOUT[0]),
+        )
+    return _aiohttp_session
+
+
+async def close_async_session():
+    """Close the pooled aiohttp session — call before the event loop exits."""
+    if _aiohttp_session is not None and not _aiohttp_session.closed:
+        await _aiohttp_session.close()
+
+
+def _retry_after_seconds(value):
+    """Seconds to wait from a Retry-After header (delta or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+async def _request_caption_async(payload: tuple) -> str:
+    """
+    Async _request_caption for a (format, bytes) payload: same retry
+    schedule as the sync Retry adapter — 0s, 3s, 6s, 12s, 24s, or the
+    Retry-After HF sends with a 429/503.
+    """
+    fmt, image_bytes = payload
+    session = _get_aiohttp_session()
+    logger.debug("Sending %dKB %s to HuggingFace (async)...", len(image_bytes) // 1024, fmt)
+
+    for attempt in range(HF_RETRIES + 1):
+        try:
+            async with session.post(HF_API_URL, headers=_HEADERS[fmt], data=image_bytes) as resp:
+                status      = resp.status
+                text        = await resp.text()
+                retry_after = resp.headers.get("Retry-After")
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"HuggingFace API timed out after {HF_TIMEOUT[1]}s. Try again.")
+        except aiohttp.ClientConnectionError as e:
+            raise RuntimeError(f"Cannot reach HuggingFace API: {e}")
+
+        logger.debug("HF response (attempt %d): %s — %.120s", attempt + 1, status, text)
+        if status not in HF_RETRY_STATUSES or attempt == HF_RETRIES:
+            break
+        delay = _retry_after_seconds(retry_after) if status in (429, 503) else None
+        if delay is None:
+            delay = HF_BACKOFF * 2 ** attempt if attempt else 0
+        if delay:
+            await asyncio.sleep(delay)
+
+    try:
+        _check_hf_status(status, text)
+    except _UnsupportedUpload:
+        if fmt == "JPEG":
+            raise RuntimeError("HuggingFace API rejected the JPEG upload (415).")
+        jpeg_bytes = _reencode_as_jpeg(image_bytes).getvalue()
+        return await _request_caption_async(("JPEG", jpeg_bytes))
+
+    return _parse_caption(_loads(text))
+
+
+_async_caption_batcher = AsyncCaptionBatcher(
+    _request_caption_async,
+    max_batch_size=CAPTION_BATCH_SIZE,
+    max_latency_ms=CAPTION_BATCH_LATENCY_MS,
+)
+
+
+async def generate_caption_async(image) -> str:
+    """
+    Async generate_caption (same inputs). JPEG encoding runs in a worker
+    thread (it is CPU-bound); the HF call goes through the async micro-batcher.
+    """
+    pixel_key = _pixel_key(image)
+    caption   = _recent_caption(pixel_key)
+    if caption is not None:
+        return caption
+
+    (fmt, buf), cache_key = await asyncio.to_thread(_prepare_upload, image)
+    caption = _cached_caption(cache_key)
+    if caption is None:
+        caption = await _async_caption_batcher.submit(cache_key, (fmt, buf.getvalue()))
+        _store_caption(cache_key, caption)
+    _remember_caption(pixel_key, caption)
     return caption
 
 
-# ── Hazard detection — scans caption text for danger keywords ─────────────────
-# Priority levels: 1=critical, 2=serious, 3=high, 4=medium, 5=low
-# Returns the HIGHEST priority (lowest number) hazard found.
-
-HAZARD_KEYWORDS = {
-    # PRIORITY 1 — CRITICAL
-    "fire":        (1, "fire detected — move away immediately", "🔥"),
-    "flame":       (1, "fire detected — move away immediately", "🔥"),
-    "flames":      (1, "fire detected — move away immediately", "🔥"),
-    "burning":     (1, "fire detected — move away immediately", "🔥"),
-    "smoke":       (1, "smoke detected — possible fire nearby", "💨"),
-    "explosion":   (1, "explosion risk — move away",            "💥"),
-    "electric":    (1, "electrical hazard nearby",              "⚡"),
-    "electrical":  (1, "electrical hazard nearby",              "⚡"),
-    "sparks":      (1, "electrical sparks — do not touch",      "⚡"),
-    "chemical":    (1, "chemical hazard nearby",                "☣️"),
-    "toxic":       (1, "toxic material nearby",                 "☣️"),
-    "gun":         (1, "weapon detected nearby",                "🚨"),
-    "weapon":      (1, "weapon detected nearby",                "🚨"),
-    "knife":       (1, "sharp weapon nearby",                   "🚨"),
-    "flood":       (1, "flooding detected — avoid area",        "🌊"),
-    "flooded":     (1, "flooding detected — avoid area",        "🌊"),
-
-    # PRIORITY 2 — SERIOUS
-    "car":         (2, "vehicle nearby — stop and wait",        "🚗"),
-    "truck":       (2, "large vehicle nearby",                  "🚛"),
-    "bus":         (2, "bus nearby — stop and wait",            "🚌"),
-    "van":         (2, "vehicle nearby — stop and wait",        "🚗"),
-    "motorcycle":  (2, "motorcycle nearby — be careful",        "🏍️"),
-    "motorbike":   (2, "motorcycle nearby — be careful",        "🏍️"),
-    "vehicle":     (2, "vehicle nearby — stop and wait",        "🚗"),
-    "traffic":     (2, "traffic ahead — do not cross",          "🚦"),
-    "road":        (2, "road ahead — watch for vehicles",       "🛣️"),
-    "street":      (2, "street ahead — watch for traffic",      "🛣️"),
-    "train":       (2, "train nearby — stay clear of tracks",   "🚆"),
-    "track":       (2, "train track — cross carefully",         "🚆"),
-    "crowd":       (2, "crowd ahead — move carefully",          "👥"),
-
-    # PRIORITY 3 — HIGH
-    "stair":       (3, "stairs ahead — hold the railing",       "🪜"),
-    "stairs":      (3, "stairs ahead — hold the railing",       "🪜"),
-    "staircase":   (3, "staircase ahead — hold the railing",    "🪜"),
-    "stairway":    (3, "stairway ahead — hold the railing",     "🪜"),
-    "step":        (3, "step ahead — watch your footing",       "⚠️"),
-    "steps":       (3, "steps ahead — watch your footing",      "⚠️"),
-    "escalator":   (3, "escalator ahead — hold the railing",    "🪜"),
-    "ladder":      (3, "ladder nearby — be careful",            "🪜"),
-    "ramp":        (3, "ramp ahead — uneven surface",           "⚠️"),
-    "cliff":       (3, "drop ahead — stay back",                "🏔️"),
-    "ledge":       (3, "ledge ahead — stay back",               "⚠️"),
-    "drop":        (3, "drop ahead — stay back",                "⚠️"),
-    "pit":         (3, "pit ahead — do not step forward",       "⚠️"),
-    "hole":        (3, "hole in floor — do not step",           "⚠️"),
-    "gap":         (3, "gap ahead — do not step",               "⚠️"),
-    "ditch":       (3, "ditch ahead — step carefully",          "⚠️"),
-    "manhole":     (3, "manhole ahead — avoid",                 "⚠️"),
-    "wet":         (3, "wet surface — slip risk",               "💧"),
-    "slippery":    (3, "slippery surface — slow down",          "💧"),
-    "puddle":      (3, "puddle on ground",                      "💧"),
-    "spill":       (3, "spill on floor — slip risk",            "💧"),
-    "ice":         (3, "ice on ground — slip risk",             "🧊"),
-    "icy":         (3, "icy surface — slip risk",               "🧊"),
-    "snow":        (3, "snow on ground — slippery",             "❄️"),
-    "mud":         (3, "muddy ground — slippery",               "⚠️"),
-
-    # PRIORITY 4 — MEDIUM
-    "door":        (4, "door ahead",                            "🚪"),
-    "doorway":     (4, "doorway ahead",                         "🚪"),
-    "entrance":    (4, "entrance ahead",                        "🚪"),
-    "exit":        (4, "exit ahead",                            "🚪"),
-    "gate":        (4, "gate ahead",                            "🚧"),
-    "turnstile":   (4, "turnstile ahead",                       "🚧"),
-    "wall":        (4, "wall ahead — stop",                     "🧱"),
-    "fence":       (4, "fence ahead",                           "🚧"),
-    "barrier":     (4, "barrier ahead",                         "🚧"),
-    "bollard":     (4, "bollard in path",                       "🚧"),
-    "pole":        (4, "pole in path",                          "⚠️"),
-    "pillar":      (4, "pillar ahead",                          "⚠️"),
-    "column":      (4, "column ahead",                          "⚠️"),
-    "beam":        (4, "beam overhead — duck",                  "⚠️"),
-    "pipe":        (4, "pipe in path",                          "⚠️"),
-    "construction":(4, "construction zone — be careful",        "🏗️"),
-    "scaffold":    (4, "scaffolding overhead",                  "🏗️"),
-    "dog":         (4, "dog nearby — approach carefully",       "🐕"),
-    "animal":      (4, "animal nearby — be cautious",           "🐾"),
-    "snake":       (4, "snake nearby — do not approach",        "🐍"),
-    "person":      (4, "person directly ahead — slow down",     "🧍"),
-    "people":      (4, "people ahead — slow down",              "👥"),
-    "child":       (4, "child nearby — be extra careful",       "👶"),
-    "baby":        (4, "baby nearby — be extra careful",        "👶"),
-    "bicycle":     (4, "bicycle nearby",                        "🚲"),
-    "bike":        (4, "bicycle nearby",                        "🚲"),
-    "glass":       (4, "glass nearby — be careful",             "⚠️"),
-    "broken":      (4, "broken object nearby",                  "⚠️"),
-    "sharp":       (4, "sharp object nearby",                   "⚠️"),
-    "debris":      (4, "debris on ground",                      "⚠️"),
-    "rubble":      (4, "rubble on ground",                      "⚠️"),
-
-    # PRIORITY 5 — LOW
-    "chair":       (5, "chair in path",                         "🪑"),
-    "stool":       (5, "stool in path",                         "🪑"),
-    "table":       (5, "table ahead",                           "🪑"),
-    "desk":        (5, "desk ahead",                            "🪑"),
-    "bench":       (5, "bench ahead",                           "🪑"),
-    "sofa":        (5, "sofa in path",                          "🛋️"),
-    "couch":       (5, "couch in path",                         "🛋️"),
-    "box":         (5, "box in path",                           "📦"),
-    "crate":       (5, "crate in path",                         "📦"),
-    "luggage":     (5, "luggage in path",                       "🧳"),
-    "suitcase":    (5, "suitcase in path",                      "🧳"),
-    "cord":        (5, "cord on ground — trip hazard",          "⚠️"),
-    "cable":       (5, "cable on ground — trip hazard",         "⚠️"),
-    "wire":        (5, "wire on ground — trip hazard",          "⚠️"),
-    "hose":        (5, "hose on ground — trip hazard",          "⚠️"),
-    "rope":        (5, "rope on ground — trip hazard",          "⚠️"),
-    "mat":         (5, "mat on floor — edge risk",              "⚠️"),
-    "rug":         (5, "rug on floor — edge risk",              "⚠️"),
-    "carpet":      (5, "carpet edge — trip risk",               "⚠️"),
-    "clutter":     (5, "clutter on floor",                      "⚠️"),
-}
-
-
-def check_for_hazards(image: Image.Image, scene_description: str = "") -> dict:
+def format_description(caption: str) -> tuple:
     """
-    Scan the scene description for the highest-priority hazard keyword.
-    No extra API call needed — uses the caption already generated.
+    Turn a caption into the spoken description.
+    Returns (description, description_lower) so the hazard scan can reuse
+    the lowercase form instead of lowering the text again.
     """
-    if not scene_description:
-        return {
-            "hazard_detected": False,
-            "hazard_type":     "",
-            "hazard_emoji":    "",
-            "hazard_priority": 99,
-            "matched_keyword": "",
-        }
-
-    text = scene_description.lower()
-    print(f"[Hazard scan] '{text[:80]}...'")
-
-    best_priority = 99
-    best_label    = ""
-    best_emoji    = ""
-    best_keyword  = ""
-
-    for keyword, (priority, label, emoji) in HAZARD_KEYWORDS.items():
-        if keyword in text and priority < best_priority:
-            best_priority = priority
-            best_label    = label
-            best_emoji    = emoji
-            best_keyword  = keyword
-
-    if best_label:
-        print(f"[Hazard] ⚠️  priority={best_priority} '{best_keyword}' → '{best_label}'")
+    if not caption:
+        description = "The image could not be described."
     else:
-        print("[Hazard] ✓ no hazard found")
-
-    return {
-        "hazard_detected": bool(best_label),
-        "hazard_type":     best_label,
-        "hazard_emoji":    best_emoji,
-        "hazard_priority": best_priority,
-        "matched_keyword": best_keyword,
-    }
+        description = f"This image shows {caption[:1].lower()}{caption[1:]}"
+        if description[-1] not in ".!?":
+            description += "."
+    return description, description.lower()
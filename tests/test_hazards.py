@@ -0,0 +1,86 @@
+# test_hazards.py
+# Table-driven checks of the hazard keyword scan, run against both scanner
+# backends: the Aho-Corasick automaton and the word-token fallback used when
+# pyahocorasick is not installed.
+#
+# Run from the repo root:  python -m unittest discover -s tests
+
+import importlib.util
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (caption, expected matched_keyword, expected priority) — "" / 99 = no hazard
+CASES = [
+    ("a red carpet in a hallway",                    "carpet",    5),
+    ("two cars parked on the side of the road",      "car",       2),
+    ("a personal computer on a desk",                "desk",      5),
+    ("a man holding a gun",                          "gun",       1),
+    ("a man holding a handgun near a campfire",      "handgun",   1),
+    ("a wildfire burning on a hill",                 "wildfire",  1),
+    ("a firetruck parked outside a station",         "firetruck", 1),
+    ("an empty railroad at dusk",                    "railroad",  2),
+    ("a dark stairwell in an office building",       "stairwell", 3),
+    ("a snowy field with trees",                     "snowy",     3),
+    ("a muddy path through the woods",               "muddy",     3),
+    ("two children playing in a park",               "children",  4),
+    ("a flooding street in the city",                "flooding",  1),
+    ("a crowded subway platform",                    "crowded",   2),
+    ("power lines and electricity pylons",           "electricity", 1),
+    ("a man stepping off a curb",                    "stepping",  3),
+    ("a house burned to the ground",                 "burned",    1),
+    ("a drawer full of kitchen knives",              "knives",    1),
+    ("coffee spilled on a tile floor",               "spilled",   3),
+    ("fireworks over a city skyline",                "fireworks", 1),
+    ("a stepladder in a garage",                     "stepladder", 3),
+    ("a pile of boxes in a garage",                  "box",       5),
+    ("a bowl of fruit",                              "",          99),
+    ("",                                             "",          99),
+]
+
+
+def _load_hazards(use_ahocorasick: bool):
+    """Import a fresh copy of hazards.py with or without pyahocorasick."""
+    name    = "hazards_ac" if use_ahocorasick else "hazards_fallback"
+    missing = object()
+    saved   = sys.modules.get("ahocorasick", missing)
+    if not use_ahocorasick:
+        sys.modules["ahocorasick"] = None   # makes "import ahocorasick" fail
+    try:
+        spec   = importlib.util.spec_from_file_location(name, os.path.join(ROOT, "hazards.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        if saved is missing:
+            sys.modules.pop("ahocorasick", None)
+        else:
+            sys.modules["ahocorasick"] = saved
+    return module
+
+
+class HazardScanTests(unittest.TestCase):
+
+    def _check_cases(self, hazards):
+        for caption, keyword, priority in CASES:
+            with self.subTest(caption=caption):
+                result = hazards.check_for_hazards(None, scene_description=caption)
+                self.assertEqual(result["matched_keyword"], keyword)
+                self.assertEqual(result["hazard_priority"], priority)
+                self.assertEqual(result["hazard_detected"], bool(keyword))
+
+    @unittest.skipIf(importlib.util.find_spec("ahocorasick") is None, "pyahocorasick not installed")
+    def test_aho_corasick_backend(self):
+        hazards = _load_hazards(use_ahocorasick=True)
+        self.assertTrue(hasattr(hazards, "_HAZARD_AUTOMATON"))
+        self._check_cases(hazards)
+
+    def test_token_fallback_backend(self):
+        hazards = _load_hazards(use_ahocorasick=False)
+        self.assertFalse(hasattr(hazards, "_HAZARD_AUTOMATON"))
+        self._check_cases(hazards)
+
+
+if __name__ == "__main__":
+    unittest.main()
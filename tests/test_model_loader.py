@@ -0,0 +1,95 @@
+# test_model_loader.py
+# Caption path checks with the HF endpoint stubbed out — no network access.
+# The caption cache goes to a throwaway directory.
+#
+# Run from the repo root:  python -m unittest discover -s tests
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_CACHE_DIR = tempfile.TemporaryDirectory()
+os.environ.setdefault("HF_API_TOKEN", "test-token")
+os.environ["CAPTION_CACHE_DIR"] = _CACHE_DIR.name
+
+from PIL import Image   # noqa: E402
+
+import model_loader     # noqa: E402
+
+
+class _FakeResponse:
+
+    def __init__(self, status, body, headers=None):
+        self.status  = status
+        self.headers = headers or {}
+        self._body   = body
+
+    async def text(self):
+        return self._body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _FakeSession:
+    """Stands in for the aiohttp session; replies with queued responses."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.posts     = []
+
+    def post(self, url, headers=None, data=None):
+        self.posts.append((headers, data))
+        return _FakeResponse(*self.responses.pop(0))
+
+
+class GenerateCaptionAsyncTests(unittest.TestCase):
+
+    def setUp(self):
+        model_loader._caption_cache.clear()
+        model_loader._recent_captions.clear()
+        self._saved_session = model_loader._get_aiohttp_session
+
+    def tearDown(self):
+        model_loader._get_aiohttp_session = self._saved_session
+
+    def _run(self, session, image):
+        model_loader._get_aiohttp_session = lambda: session
+        return asyncio.run(model_loader.generate_caption_async(image))
+
+    def test_cache_miss_calls_hf_then_hits_cache(self):
+        session = _FakeSession((200, '[{"generated_text": "a dog on a couch"}]'))
+        image   = Image.new("RGB", (64, 48), (120, 80, 40))
+
+        self.assertEqual(self._run(session, image), "A dog on a couch.")
+        self.assertEqual(len(session.posts), 1)
+
+        model_loader._recent_captions.clear()   # force the disk cache lookup
+        self.assertEqual(self._run(session, image), "A dog on a couch.")
+        self.assertEqual(len(session.posts), 1)
+
+    def test_hf_error_is_raised(self):
+        session = _FakeSession((400, '{"error": "bad image"}'))
+        with self.assertRaises(RuntimeError):
+            self._run(session, Image.new("RGB", (32, 32), (1, 2, 3)))
+
+
+class PixelKeyTests(unittest.TestCase):
+
+    def test_size_and_mode_are_part_of_the_key(self):
+        key = model_loader._pixel_key
+        self.assertNotEqual(key(Image.new("RGB", (100, 200))), key(Image.new("RGB", (200, 100))))
+        self.assertNotEqual(key(Image.new("L", (30, 10))), key(Image.new("RGB", (10, 10))))
+        self.assertEqual(key(Image.new("RGB", (100, 200))), key(Image.new("RGB", (100, 200))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,19 +1,56 @@
 # tts_generator.py
 # Handles converting a text description into an MP3 audio file
 # using Google Text-to-Speech (gTTS).
+#
+# Optional: set TTS_ENGINE=piper to synthesize locally with Piper instead
+# (pip install piper-tts, and point PIPER_VOICE at a downloaded .onnx voice).
+# That removes the network round-trip to Google; files are then WAV.
+# Piper is CPU-bound: under gunicorn's gevent worker the TTS pool's "threads"
+# are greenlets, so synthesis is handed to gevent's native threadpool (see
+# _run_native) instead of stalling every request on that worker.
 
 from gtts import gTTS
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import heapq
+import logging
 import os
-import uuid
+import tempfile
+import wave
 
+logger = logging.getLogger(__name__)
 
-def generate_audio(text: str, output_dir: str) -> str:
+TTS_ENGINE  = os.environ.get("TTS_ENGINE", "gtts").lower()
+PIPER_VOICE = os.environ.get("PIPER_VOICE", "en_US-lessac-medium.onnx")
+
+# Falls back to gTTS if piper-tts or the voice file is missing
+_piper_voice = None
+if TTS_ENGINE == "piper":
+    try:
+        from piper import PiperVoice
+        _piper_voice = PiperVoice.load(PIPER_VOICE)
+    except Exception as e:
+        logger.warning("Piper TTS unavailable (%s) — using gTTS.", e)
+
+AUDIO_EXT      = ".wav"      if _piper_voice is not None else ".mp3"
+AUDIO_MIMETYPE = "audio/wav" if _piper_voice is not None else "audio/mpeg"
+
+# Shared worker pool for synthesis — a gTTS call blocks on an HTTP round-trip,
+# so it never runs on a request thread or an event loop.
+TTS_WORKERS = int(os.environ.get("TTS_WORKERS", 4))
+_TTS_POOL   = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts")
+
+
+def generate_audio(text: str, output_dir: str, filename: str = None) -> str:
     """
-    Convert a text string to spoken audio and save as an MP3 file.
+    Convert a text string to spoken audio and save as an MP3 file
+    (WAV when the Piper engine is active — see AUDIO_EXT).
 
     Args:
         text:       The description text to convert to speech
         output_dir: Directory path where the MP3 file should be saved
+        filename:   Optional fixed filename (default: audio_filename(text))
 
     Returns:
         The filename (not full path) of the saved MP3 file
@@ -22,46 +59,110 @@ def generate_audio(text: str, output_dir: str) -> str:
     # Ensure output directory exists
     os.makedirs(output_dir, exist_ok=True)
 
-    # Generate a unique filename to avoid overwriting previous audio files
-    # This also allows multiple users to use the app without conflicts
-    filename = f"description_{uuid.uuid4().hex[:8]}.mp3"
+    # Identical text maps to the same file, so a repeat is a cache hit:
+    # no TTS call and no disk write, just an mtime refresh for the LRU sweep
+    if filename is None:
+        filename = audio_filename(text)
     filepath = os.path.join(output_dir, filename)
+    if os.path.exists(filepath):
+        os.utime(filepath)
+        logger.debug("Audio cache hit: %s", filename)
+        return filename
 
-    # Create a gTTS object
-    # lang='en' — English language
-    # slow=False — normal speaking speed (True makes it slower, good for accessibility)
-    tts = gTTS(text=text, lang="en", slow=False)
-
-    # Save the audio to file
-    tts.save(filepath)
+    # Save to a temporary name first so a half-written file is never served.
+    # The name is unique per call: two writers for the same text each get
+    # their own file, and whichever finishes last replaces the other's.
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix=f"{filename}.", suffix=".part")
+    os.close(fd)
+    os.chmod(tmp_path, 0o644)   # mkstemp creates it owner-only
+    try:
+        if _piper_voice is not None:
+            _synthesize_piper(text, tmp_path)
+        else:
+            # lang='en' — English language
+            # slow=False — normal speaking speed (True makes it slower, good for accessibility)
+            gTTS(text=text, lang="en", slow=False).save(tmp_path)
+        os.replace(tmp_path, filepath)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
-    print(f"Audio saved: {filepath}")
+    logger.debug("Audio saved: %s", filepath)
     return filename
 
 
+def audio_filename(text: str) -> str:
+    """Filename for the audio of text — a hash, so identical text shares one file."""
+    digest = hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+    return f"description_{digest}{AUDIO_EXT}"
+
+
+def submit_audio(text: str, output_dir: str, filename: str = None):
+    """Run generate_audio on the shared TTS pool; returns a Future of the filename."""
+    return _TTS_POOL.submit(generate_audio, text, output_dir, filename)
+
+
+async def generate_audio_async(text: str, output_dir: str, filename: str = None) -> str:
+    """Async generate_audio — awaits the shared TTS pool, never blocks the loop."""
+    return await asyncio.wrap_future(submit_audio(text, output_dir, filename))
+
+
+def _run_native(fn, *args):
+    """
+    Call fn(*args) on a real OS thread when gevent has monkey-patched
+    threading (the TTS pool then runs greenlets, which CPU-bound work would
+    block); otherwise call it directly — the pool thread is already native.
+    """
+    try:
+        from gevent import get_hub, monkey
+    except ImportError:
+        return fn(*args)
+    if not monkey.is_module_patched("threading"):
+        return fn(*args)
+    return get_hub().threadpool.apply(fn, args)
+
+
+def _synthesize_piper(text: str, path: str):
+    """Write text as a WAV file using the local Piper voice."""
+    # piper-tts >= 1.3 renamed the WAV-writing call to synthesize_wav
+    synthesize = getattr(_piper_voice, "synthesize_wav", _piper_voice.synthesize)
+    with wave.open(path, "wb") as wav_file:
+        _run_native(synthesize, text, wav_file)
+
+
 def cleanup_old_audio(output_dir: str, keep_latest: int = 10):
     """
-    Remove old audio files, keeping only the most recent ones.
+    Remove old audio files, keeping only the most recently used ones.
     Prevents the static/audio folder from filling up during a demo session.
+    Cached files are touched on reuse, so ordering by mtime is LRU. The state
+    lives on disk, so every gunicorn worker sees the same ordering — a file
+    one worker just wrote or reused is the newest for all of them.
 
     Args:
         output_dir:  Directory containing audio files
-        keep_latest: Number of recent files to keep (default: 10)
+        keep_latest: Number of recently used files to keep (default: 10)
     """
     try:
-        files = [
-            os.path.join(output_dir, f)
-            for f in os.listdir(output_dir)
-            if f.endswith(".mp3")
-        ]
-        # Sort by modification time (oldest first)
-        files.sort(key=os.path.getmtime)
-
-        # Delete files beyond the keep limit
-        files_to_delete = files[:-keep_latest] if len(files) > keep_latest else []
-        for f in files_to_delete:
-            os.remove(f)
-            print(f"Cleaned up old audio file: {f}")
+        # One directory pass; each file is stat'ed once and its mtime reused
+        with os.scandir(output_dir) as it:
+            files = [
+                (entry.stat().st_mtime, entry.name, entry.path)
+                for entry in it
+                if entry.name.endswith(AUDIO_EXT)
+            ]
+        # Only the newest keep_latest need ordering — O(N log k), not a full
+        # sort; everything else is deleted
+        keep = heapq.nlargest(keep_latest, files)
+        if len(keep) < len(files):
+            kept = set(keep)
+            for entry in files:
+                if entry not in kept:
+                    try:
+                        os.remove(entry[2])
+                    except FileNotFoundError:
+                        continue   # another worker's sweep got there first
+                    logger.debug("Cleaned up old audio file: %s", entry[2])
 
     except Exception as e:
-        print(f"Cleanup warning (non-critical): {e}")
+        logger.warning("Cleanup warning (non-critical): %s", e)